@@ -1,54 +1,410 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
+import gc
+import os
+import tempfile
+import threading
+import zlib
 from pathlib import Path
 
 DATA_DIR = Path(__file__).parent / "data"
+# Incrementar si cambia la forma en que se construyen los datos; también invalida la
+# caché persistida de load_data
+VENTAS_EXT_VERSION = 2
 
-@st.cache_data
-def load_data():
-    clientes = pd.read_csv(DATA_DIR / "clientes_andina.csv", parse_dates=["fecha_alta"])
-    productos = pd.read_csv(DATA_DIR / "productos_andina.csv")
-    ventas = pd.read_csv(
-        DATA_DIR / "ventas_andina.csv",
-        parse_dates=["fecha"],
-    )
-    inventario = pd.read_csv(DATA_DIR / "inventario_andina.csv", parse_dates=["fecha_corte"])
-    importaciones = pd.read_csv(DATA_DIR / "importaciones_andina.csv", parse_dates=["fecha_orden", "fecha_llegada"])
-    cartera = pd.read_csv(DATA_DIR / "cartera_andina.csv", parse_dates=["fecha_factura", "fecha_vencimiento"])
+
+def _escribir_parquet(df, destino):
+    """Escribe el Parquet en un temporal del mismo directorio y lo mueve con os.replace.
+
+    Así una escritura interrumpida nunca deja un archivo truncado con el nombre final.
+    """
+    fd, tmp = tempfile.mkstemp(dir=destino.parent, prefix=".", suffix=".tmp")
+    os.close(fd)
+    try:
+        df.to_parquet(tmp, engine="pyarrow", compression="zstd")
+        os.replace(tmp, destino)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _csv_to_parquet(path, **opciones):
+    """Convierte el CSV a Parquet una sola vez y devuelve la ruta del Parquet.
+
+    El nombre incluye una huella de las opciones de lectura; se regenera si el
+    Parquet no existe o es más antiguo que el CSV.
+    """
+    # El lector CSV de Arrow tokeniza y convierte las fechas de forma vectorizada
+    opciones = {"engine": "pyarrow", **opciones}
+    huella = zlib.crc32(repr(sorted(opciones.items())).encode())
+    parquet_path = path.with_name(f"{path.stem}_{huella:08x}.parquet")
+    if not parquet_path.exists() or parquet_path.stat().st_mtime < path.stat().st_mtime:
+        df = pd.read_csv(path, **opciones)
+        _escribir_parquet(df, parquet_path)
+    return parquet_path
+
+
+@st.cache_resource
+def _icon(nombre):
+    """Bytes del ícono incluido en data/icons."""
+    return (DATA_DIR / "icons" / nombre).read_bytes()
+
+
+def _mes_label(code):
+    """Convierte un código de mes (anio*12 + mes-1) a texto "YYYY-MM"."""
+    return f"{code // 12:04d}-{code % 12 + 1:02d}"
+
+
+def _firma_fuentes():
+    """Versión de los datos y fechas de modificación de los CSV fuente.
+
+    Streamlit solo hashea el código de load_data, así que todo lo que deba invalidar su
+    caché en disco entra por este valor.
+    """
+    return (VENTAS_EXT_VERSION,) + tuple(p.stat().st_mtime_ns for p in sorted(DATA_DIR.glob("*_andina.csv")))
+
+
+# Persistida en disco para que un reinicio no repita la carga; `firma` la invalida si cambian los CSV
+@st.cache_data(persist="disk", show_spinner="Cargando datos...", max_entries=1)
+def load_data(firma):
+    # Las fechas llegan tipadas desde Parquet
+    inventario = pd.read_parquet(_csv_to_parquet(DATA_DIR / "inventario_andina.csv", parse_dates=["fecha_corte"]))
+    importaciones = pd.read_parquet(_csv_to_parquet(DATA_DIR / "importaciones_andina.csv", parse_dates=["fecha_orden", "fecha_llegada"]))
+    cartera = pd.read_parquet(_csv_to_parquet(DATA_DIR / "cartera_andina.csv", parse_dates=["fecha_factura", "fecha_vencimiento"]))
 
     # Limpieza básica
-    clientes = clientes.drop_duplicates(subset=["cliente_id"]).dropna(subset=["cliente_id"])
-    productos = productos.drop_duplicates(subset=["producto_id"]).dropna(subset=["producto_id"])
-    ventas = ventas.dropna(subset=["venta_id", "fecha", "cliente_id", "producto_id"])
     cartera = cartera.dropna(subset=["documento_id", "cliente_id", "fecha_factura"])
 
-    # Asegurar tipos
-    ventas["cliente_id"] = ventas["cliente_id"].astype(int)
-    ventas["producto_id"] = ventas["producto_id"].astype(int)
+    # Montos en precisión simple: se muestran redondeados y reducen a la mitad los bytes por agregación
+    inventario["valor_inventario_cop"] = inventario["valor_inventario_cop"].astype(np.float32)
+    importaciones["costo_mercancia_usd"] = importaciones["costo_mercancia_usd"].astype(np.float32)
+
+    # Saldos de cartera por estado (no dependen de los filtros)
+    saldos = cartera.groupby("estado", observed=True)["saldo_cop"].sum()
+
+    # ventas_ext persistido en Parquet, identificado por las fechas de modificación de sus fuentes
+    fuentes = [DATA_DIR / f for f in ("clientes_andina.csv", "productos_andina.csv", "ventas_andina.csv")]
+    key = hash(tuple(p.stat().st_mtime_ns for p in fuentes)) & 0xFFFFFFFFFFFFFFFF
+    cache_path = DATA_DIR / f"ventas_ext_v{VENTAS_EXT_VERSION}_{key:016x}.parquet"
+
+    if cache_path.exists():
+        ventas_ext = pd.read_parquet(cache_path)
+    else:
+        clientes = pd.read_parquet(_csv_to_parquet(DATA_DIR / "clientes_andina.csv", parse_dates=["fecha_alta"]))
+        productos = pd.read_parquet(_csv_to_parquet(DATA_DIR / "productos_andina.csv"))
+        ventas = pd.read_parquet(_csv_to_parquet(DATA_DIR / "ventas_andina.csv", parse_dates=["fecha"]))
+
+        # Limpieza básica
+        clientes = clientes.drop_duplicates(subset=["cliente_id"]).dropna(subset=["cliente_id"])
+        productos = productos.drop_duplicates(subset=["producto_id"]).dropna(subset=["producto_id"])
+        ventas = ventas.dropna(subset=["venta_id", "fecha", "cliente_id", "producto_id"])
+
+        # Asegurar tipos
+        ventas["cliente_id"] = ventas["cliente_id"].astype(int)
+        ventas["producto_id"] = ventas["producto_id"].astype(int)
+        for c in ("subtotal_cop", "margen_total_cop"):
+            ventas[c] = ventas[c].astype(np.float32)
+        # cantidad no está en el dropna: los faltantes cuentan como 0 unidades
+        ventas["cantidad"] = ventas["cantidad"].fillna(0).astype(np.int32)
+
+        # Columnas de texto de baja cardinalidad como categorías
+        for c in ["nombre_cliente", "segmento", "region", "ciudad"]:
+            clientes[c] = clientes[c].astype("category")
+        for c in ["sku", "categoria", "subcategoria", "marca", "descripcion"]:
+            productos[c] = productos[c].astype("category")
+
+        # Enriquecimiento para análisis principal
+        ventas_ext = (
+            ventas
+            .merge(clientes[["cliente_id", "nombre_cliente", "segmento", "region", "ciudad"]], on="cliente_id", how="left", suffixes=("", "_cli"))
+            .merge(productos[["producto_id", "sku", "categoria", "subcategoria", "marca", "descripcion"]], on="producto_id", how="left")
+        )
+        # Las tablas fuente no se devuelven; liberarlas antes de seguir
+        del clientes, productos, ventas
+        gc.collect()
+
+        for c in ["region", "segmento", "ciudad", "categoria", "subcategoria", "marca", "nombre_cliente", "sku", "descripcion"]:
+            ventas_ext[c] = ventas_ext[c].astype("category")
+
+        # Campos derivados
+        ventas_ext["anio"] = ventas_ext["fecha"].dt.year
+        # Mes como código entero (anio*12 + mes-1); se formatea solo al graficar
+        ventas_ext["mes_code"] = (
+            ventas_ext["fecha"].dt.year.astype(np.int32) * 12
+            + ventas_ext["fecha"].dt.month.astype(np.int32) - 1
+        )
 
-    # Enriquecimiento para análisis principal
-    ventas_ext = (
-        ventas
-        .merge(clientes[["cliente_id", "nombre_cliente", "segmento", "region", "ciudad"]], on="cliente_id", how="left", suffixes=("", "_cli"))
-        .merge(productos[["producto_id", "sku", "categoria", "subcategoria", "marca", "descripcion"]], on="producto_id", how="left")
+        # Ordenar por fecha para filtrar el rango con búsqueda binaria
+        ventas_ext = ventas_ext.sort_values("fecha").reset_index(drop=True)
+        _escribir_parquet(ventas_ext, cache_path)
+        # Eliminar cachés de versiones o fuentes anteriores
+        for viejo in DATA_DIR.glob("ventas_ext_*.parquet"):
+            if viejo != cache_path:
+                viejo.unlink(missing_ok=True)
+
+    # Rango global de fechas según todas las tablas
+    min_date = min(
+        ventas_ext["fecha"].min(),
+        cartera["fecha_factura"].min(),
+        inventario["fecha_corte"].min(),
+        importaciones["fecha_orden"].min(),
+    )
+    max_date = max(
+        ventas_ext["fecha"].max(),
+        cartera["fecha_factura"].max(),
+        inventario["fecha_corte"].max(),
+        importaciones["fecha_orden"].max(),
     )
 
-    # Campos derivados
-    ventas_ext["anio"] = ventas_ext["fecha"].dt.year
-    ventas_ext["mes"] = ventas_ext["fecha"].dt.to_period("M").astype(str)
+    # Opciones de los filtros: categorías presentes en las ventas
+    regiones = sorted(ventas_ext["region"].cat.remove_unused_categories().cat.categories.tolist())
+    segmentos = sorted(ventas_ext["segmento"].cat.remove_unused_categories().cat.categories.tolist())
 
     return {
-        "clientes": clientes,
-        "productos": productos,
-        "ventas": ventas,
         "ventas_ext": ventas_ext,
         "inventario": inventario,
         "importaciones": importaciones,
-        "cartera": cartera,
+        "cartera_vigente": saldos.get("Vigente", 0),
+        "cartera_mora": saldos.get("En mora", 0),
+        "min_date": min_date,
+        "max_date": max_date,
+        "regiones": regiones,
+        "segmentos": segmentos,
     }
 
 
+@st.cache_resource
+def _estado_carga():
+    """Estado compartido entre sesiones: última firma cargada y el candado que la protege."""
+    return {"firma": None, "lock": threading.Lock()}
+
+
+def _cargar_datos():
+    """Devuelve (firma, datos) y descarta la caché persistida de firmas anteriores.
+
+    La limpieza ocurre aquí y no dentro de load_data: hacerlo mientras se calcula
+    reiniciaría sus candados por clave y permitiría cargas en paralelo.
+    """
+    firma = _firma_fuentes()
+    estado = _estado_carga()
+    with estado["lock"]:
+        if estado["firma"] != firma:
+            if estado["firma"] is not None:
+                load_data.clear()
+            data = load_data(firma)
+            estado["firma"] = firma
+            return firma, data
+    return firma, load_data(firma)
+
+
+def filtrar_ventas(data, desde, hasta, region, segmento):
+    """Ventas entre desde y hasta (inclusive) con los filtros de región y segmento.
+
+    `data` es el diccionario ya cargado por load_data.
+    """
+    ventas_ext = data["ventas_ext"]
+    fechas = ventas_ext["fecha"].to_numpy()
+    desde64 = np.datetime64(desde)
+    hasta64 = np.datetime64(hasta) + np.timedelta64(1, "D")
+
+    if len(fechas) and desde64 <= fechas[0] and hasta64 > fechas[-1]:
+        # Rango completo (caso por defecto): usar la tabla sin recortar
+        ventas_f = ventas_ext
+    else:
+        lo, hi = np.searchsorted(fechas, [desde64, hasta64])
+        ventas_f = ventas_ext.iloc[lo:hi]
+
+    # Solo se construyen máscaras para los filtros activos
+    if region != "Todos":
+        ventas_f = ventas_f[ventas_f["region"] == region]
+
+    if segmento != "Todos":
+        ventas_f = ventas_f[ventas_f["segmento"] == segmento]
+    return ventas_f
+
+
+def _suma_por_categorias(df, claves, valor):
+    """Suma `valor` por combinación de columnas categóricas usando np.bincount sobre sus códigos.
+
+    Equivale a ``df.groupby(claves, as_index=False, observed=True)[valor].sum()``.
+    """
+    categorias = [df[c].cat.categories for c in claves]
+    codigos = [df[c].cat.codes.to_numpy() for c in claves]
+    validos = np.logical_and.reduce([c >= 0 for c in codigos])
+
+    # Código combinado de grupo en base mixta (una cifra por clave)
+    grupo = np.zeros(int(validos.sum()), dtype=np.int64)
+    for cods, cats in zip(codigos, categorias):
+        grupo = grupo * len(cats) + cods[validos]
+    n_grupos = int(np.prod([len(cats) for cats in categorias]))
+
+    valores = df[valor].to_numpy()[validos]
+    conteo = np.bincount(grupo, minlength=n_grupos)
+    suma = np.bincount(grupo, weights=np.nan_to_num(valores), minlength=n_grupos)
+
+    observados = np.flatnonzero(conteo)
+    resultado = {}
+    resto = observados
+    for nombre, cats in reversed(list(zip(claves, categorias))):
+        resultado[nombre] = pd.Categorical.from_codes(resto % len(cats), categories=cats)
+        resto = resto // len(cats)
+    resultado = {nombre: resultado[nombre] for nombre in claves}
+    resultado[valor] = suma[observados].astype(valores.dtype)
+    return pd.DataFrame(resultado)
+
+
+# Agregaciones cacheadas por combinación de filtros. `_data` no forma parte de la
+# clave (se excluye por el guion bajo) para no volver a copiar ni hashear el dataset;
+# `firma` sí, para que los gráficos se recalculen cuando cambian los CSV.
+@st.cache_data(show_spinner=False, max_entries=64)
+def agg_mes(_data, firma, desde, hasta, region, segmento):
+    ventas_f = filtrar_ventas(_data, desde, hasta, region, segmento)
+    ventas_mes = (
+        ventas_f[["mes_code", "subtotal_cop", "margen_total_cop"]]
+        .groupby("mes_code", sort=True)
+        .sum()
+    )
+    ventas_mes["mes"] = ventas_mes.index.map(_mes_label)
+    return ventas_mes
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def agg_region_seg(_data, firma, desde, hasta, region, segmento):
+    ventas_f = filtrar_ventas(_data, desde, hasta, region, segmento)
+    return _suma_por_categorias(ventas_f, ["region", "segmento"], "subtotal_cop")
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def agg_ciudad(_data, firma, desde, hasta, region, segmento):
+    ventas_f = filtrar_ventas(_data, desde, hasta, region, segmento)
+    return _suma_por_categorias(ventas_f, ["region", "ciudad"], "subtotal_cop")
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def agg_top_clientes(_data, firma, desde, hasta, region, segmento):
+    ventas_f = filtrar_ventas(_data, desde, hasta, region, segmento)
+    return (
+        ventas_f[["cliente_id", "nombre_cliente", "subtotal_cop"]]
+        .groupby(["cliente_id", "nombre_cliente"], as_index=False, observed=True)
+        .sum()
+        .nlargest(15, "subtotal_cop")
+    )
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def agg_top_productos(_data, firma, desde, hasta, region, segmento):
+    ventas_f = filtrar_ventas(_data, desde, hasta, region, segmento)
+    return (
+        ventas_f[["producto_id", "sku", "descripcion", "subtotal_cop"]]
+        .groupby(["producto_id", "sku", "descripcion"], as_index=False, observed=True)
+        .sum()
+        .nlargest(15, "subtotal_cop")
+    )
+
+
+def render_tab1(data, firma, desde, hasta, region, segmento):
+    st.subheader("Evolución de ventas y margen")
+    ventas_mes = agg_mes(data, firma, desde, hasta, region, segmento)
+    fig1 = px.bar(
+        ventas_mes,
+        x="mes",
+        y="subtotal_cop",
+        title="Ventas por mes (COP)",
+    )
+    st.plotly_chart(fig1, use_container_width=True)
+
+    # Línea en WebGL para que el navegador la rasterice en GPU
+    fig2 = go.Figure(
+        go.Scattergl(x=ventas_mes["mes"], y=ventas_mes["margen_total_cop"], mode="lines"),
+    )
+    fig2.update_layout(
+        title="Margen total por mes (COP)",
+        xaxis_title="mes",
+        yaxis_title="margen_total_cop",
+    )
+    st.plotly_chart(fig2, use_container_width=True)
+
+
+def render_tab2(data, firma, desde, hasta, region, segmento):
+    st.subheader("Ventas por región y segmento")
+    ventas_region = agg_region_seg(data, firma, desde, hasta, region, segmento)
+    fig3 = px.treemap(
+        ventas_region,
+        path=["region", "segmento"],
+        values="subtotal_cop",
+        title="Contribución por región y segmento",
+    )
+    st.plotly_chart(fig3, use_container_width=True)
+
+    # Limitar las barras para que el gráfico no crezca con el número de ciudades
+    ventas_ciudad = agg_ciudad(data, firma, desde, hasta, region, segmento).nlargest(30, "subtotal_cop")
+    fig4 = px.bar(
+        ventas_ciudad,
+        x="ciudad",
+        y="subtotal_cop",
+        color="region",
+        title="Ventas por ciudad (top 30)",
+    )
+    st.plotly_chart(fig4, use_container_width=True)
+
+
+def render_tab3(data, firma, desde, hasta, region, segmento):
+    st.subheader("Top clientes")
+    top_clientes = agg_top_clientes(data, firma, desde, hasta, region, segmento)
+    fig5 = px.bar(
+        top_clientes,
+        x="subtotal_cop",
+        y="nombre_cliente",
+        orientation="h",
+        title="Top 15 clientes por ventas",
+    )
+    st.plotly_chart(fig5, use_container_width=True)
+
+    st.subheader("Top productos")
+    top_productos = agg_top_productos(data, firma, desde, hasta, region, segmento)
+    fig6 = px.bar(
+        top_productos,
+        x="subtotal_cop",
+        y="descripcion",
+        orientation="h",
+        title="Top 15 productos por ventas",
+    )
+    st.plotly_chart(fig6, use_container_width=True)
+
+
+def render_tab4(inventario, importaciones):
+    st.subheader("Inventario por centro logístico")
+    inv_resumen = (
+        inventario
+        .groupby(["centro_logistico"], as_index=False)["valor_inventario_cop"]
+        .sum()
+    )
+    fig7 = px.bar(
+        inv_resumen,
+        x="centro_logistico",
+        y="valor_inventario_cop",
+        title="Valor de inventario por centro logístico",
+    )
+    st.plotly_chart(fig7, use_container_width=True)
+
+    st.subheader("Costos de importaciones por país de origen")
+    imp_resumen = (
+        importaciones
+        .groupby("pais_origen", as_index=False)["costo_mercancia_usd"]
+        .sum()
+    )
+    fig8 = px.pie(
+        imp_resumen,
+        names="pais_origen",
+        values="costo_mercancia_usd",
+        title="Distribución de costo de mercancía por país",
+    )
+    st.plotly_chart(fig8, use_container_width=True)
+
+
 def main():
     st.set_page_config(page_title="Dashboard Andina", layout="wide")
     st.title("Dashboard Comercial Andina")
@@ -65,31 +421,15 @@ def main():
         unsafe_allow_html=True,
     )
 
-    data = load_data()
-    ventas_ext = data["ventas_ext"]
-    cartera = data["cartera"]
+    firma, data = _cargar_datos()
     inventario = data["inventario"]
     importaciones = data["importaciones"]
 
     # Filtros
     st.sidebar.header("Filtros")
 
-    # Rango global de fechas según todas las tablas
-    fechas_min = [
-        ventas_ext["fecha"].min(),
-        cartera["fecha_factura"].min(),
-        inventario["fecha_corte"].min(),
-        importaciones["fecha_orden"].min(),
-    ]
-    fechas_max = [
-        ventas_ext["fecha"].max(),
-        cartera["fecha_factura"].max(),
-        inventario["fecha_corte"].max(),
-        importaciones["fecha_orden"].max(),
-    ]
-
-    min_date = min(fechas_min)
-    max_date = max(fechas_max)
+    min_date = data["min_date"]
+    max_date = data["max_date"]
     fecha_desde, fecha_hasta = st.sidebar.date_input(
         "Rango de fechas",
         value=(min_date, max_date),
@@ -97,16 +437,14 @@ def main():
         max_value=max_date,
     )
 
-    regiones = sorted(ventas_ext["region"].dropna().unique())
-    regiones_opciones = ["Todos"] + regiones
+    regiones_opciones = ["Todos"] + data["regiones"]
     region_sel = st.sidebar.selectbox(
         "Región",
         options=regiones_opciones,
         index=0,
     )
 
-    segmentos = sorted(ventas_ext["segmento"].dropna().unique())
-    segmentos_opciones = ["Todos"] + segmentos
+    segmentos_opciones = ["Todos"] + data["segmentos"]
     segmento_sel = st.sidebar.selectbox(
         "Segmento",
         options=segmentos_opciones,
@@ -114,191 +452,69 @@ def main():
     )
 
     # Aplicar filtros
-    mask = (
-        (ventas_ext["fecha"] >= pd.to_datetime(fecha_desde))
-        & (ventas_ext["fecha"] <= pd.to_datetime(fecha_hasta))
-    )
-
-    if region_sel != "Todos":
-        mask &= ventas_ext["region"] == region_sel
+    ventas_f = filtrar_ventas(data, fecha_desde, fecha_hasta, region_sel, segmento_sel)
 
-    if segmento_sel != "Todos":
-        mask &= ventas_ext["segmento"] == segmento_sel
-    ventas_f = ventas_ext[mask].copy()
-
-    # KPIs principales
-    total_ventas = ventas_f["subtotal_cop"].sum()
-    margen_total = ventas_f["margen_total_cop"].sum()
+    # KPIs principales (acumulados en float64 para no perder dígitos en los totales)
+    total_ventas = np.nansum(ventas_f["subtotal_cop"].to_numpy(), dtype=np.float64)
+    margen_total = np.nansum(ventas_f["margen_total_cop"].to_numpy(), dtype=np.float64)
     total_unidades = ventas_f["cantidad"].sum()
 
     # Cartera
-    cartera_vigente = cartera[cartera["estado"] == "Vigente"]["saldo_cop"].sum()
-    cartera_mora = cartera[cartera["estado"] == "En mora"]["saldo_cop"].sum()
+    cartera_vigente = data["cartera_vigente"]
+    cartera_mora = data["cartera_mora"]
 
     row1_col1, row1_col2, row1_col3 = st.columns(3)
     row2_col1, row2_col2 = st.columns(2)
 
     with row1_col1:
-        st.image(
-            "https://cdn-icons-png.flaticon.com/512/1170/1170678.png",
-            width=32,
-        )
+        st.image(_icon("ventas.png"), width=32)
         st.metric("Ventas filtradas (COP)", f"${total_ventas:,.0f}")
 
     with row1_col2:
-        st.image(
-            "https://cdn-icons-png.flaticon.com/512/929/929430.png",
-            width=32,
-        )
+        st.image(_icon("margen.png"), width=32)
         st.metric("Margen total (COP)", f"${margen_total:,.0f}")
 
     with row1_col3:
-        st.image(
-            "https://cdn-icons-png.flaticon.com/512/5690/5690739.png",
-            width=32,
-        )
+        st.image(_icon("unidades.png"), width=32)
         st.metric("Unidades vendidas", f"{int(total_unidades):,}")
 
     with row2_col1:
-        st.image(
-            "https://cdn-icons-png.flaticon.com/512/992/992020.png",
-            width=32,
-        )
+        st.image(_icon("cartera_vigente.png"), width=32)
         st.metric("Cartera vigente (COP)", f"${cartera_vigente:,.0f}")
 
     with row2_col2:
-        st.image(
-            "https://cdn-icons-png.flaticon.com/512/992/992001.png",
-            width=32,
-        )
+        st.image(_icon("cartera_mora.png"), width=32)
         st.metric("Cartera en mora (COP)", f"${cartera_mora:,.0f}")
 
     st.markdown("---")
 
-    # Gráficos de ventas
-    tab1, tab2, tab3, tab4 = st.tabs([
-        "Evolución temporal",
-        "Por región y segmento",
-        "Top clientes / productos",
-        "Inventario e importaciones",
-    ])
-
-    with tab1:
-        st.subheader("Evolución de ventas y margen")
-        ventas_mes = (
-            ventas_f
-            .groupby("mes", as_index=False)[["subtotal_cop", "margen_total_cop"]]
-            .sum()
-            .sort_values("mes")
-        )
-        fig1 = px.bar(
-            ventas_mes,
-            x="mes",
-            y="subtotal_cop",
-            title="Ventas por mes (COP)",
-        )
-        st.plotly_chart(fig1, use_container_width=True)
+    # Gráficos de ventas: solo se calcula la pestaña abierta
+    tab1, tab2, tab3, tab4 = st.tabs(
+        [
+            "Evolución temporal",
+            "Por región y segmento",
+            "Top clientes / productos",
+            "Inventario e importaciones",
+        ],
+        key="tab",
+        on_change="rerun",
+    )
 
-        fig2 = px.line(
-            ventas_mes,
-            x="mes",
-            y="margen_total_cop",
-            title="Margen total por mes (COP)",
-        )
-        st.plotly_chart(fig2, use_container_width=True)
-
-    with tab2:
-        st.subheader("Ventas por región y segmento")
-        ventas_region = (
-            ventas_f
-            .groupby(["region", "segmento"], as_index=False)["subtotal_cop"]
-            .sum()
-        )
-        fig3 = px.treemap(
-            ventas_region,
-            path=["region", "segmento"],
-            values="subtotal_cop",
-            title="Contribución por región y segmento",
-        )
-        st.plotly_chart(fig3, use_container_width=True)
+    if tab1.open:
+        with tab1:
+            render_tab1(data, firma, fecha_desde, fecha_hasta, region_sel, segmento_sel)
 
-        ventas_ciudad = (
-            ventas_f
-            .groupby(["region", "ciudad"], as_index=False)["subtotal_cop"]
-            .sum()
-        )
-        fig4 = px.bar(
-            ventas_ciudad,
-            x="ciudad",
-            y="subtotal_cop",
-            color="region",
-            title="Ventas por ciudad",
-        )
-        st.plotly_chart(fig4, use_container_width=True)
-
-    with tab3:
-        st.subheader("Top clientes")
-        top_clientes = (
-            ventas_f
-            .groupby(["cliente_id", "nombre_cliente"], as_index=False)["subtotal_cop"]
-            .sum()
-            .sort_values("subtotal_cop", ascending=False)
-            .head(15)
-        )
-        fig5 = px.bar(
-            top_clientes,
-            x="subtotal_cop",
-            y="nombre_cliente",
-            orientation="h",
-            title="Top 15 clientes por ventas",
-        )
-        st.plotly_chart(fig5, use_container_width=True)
-
-        st.subheader("Top productos")
-        top_productos = (
-            ventas_f
-            .groupby(["producto_id", "sku", "descripcion"], as_index=False)["subtotal_cop"]
-            .sum()
-            .sort_values("subtotal_cop", ascending=False)
-            .head(15)
-        )
-        fig6 = px.bar(
-            top_productos,
-            x="subtotal_cop",
-            y="descripcion",
-            orientation="h",
-            title="Top 15 productos por ventas",
-        )
-        st.plotly_chart(fig6, use_container_width=True)
-
-    with tab4:
-        st.subheader("Inventario por centro logístico")
-        inv_resumen = (
-            inventario
-            .groupby(["centro_logistico"], as_index=False)["valor_inventario_cop"]
-            .sum()
-        )
-        fig7 = px.bar(
-            inv_resumen,
-            x="centro_logistico",
-            y="valor_inventario_cop",
-            title="Valor de inventario por centro logístico",
-        )
-        st.plotly_chart(fig7, use_container_width=True)
+    if tab2.open:
+        with tab2:
+            render_tab2(data, firma, fecha_desde, fecha_hasta, region_sel, segmento_sel)
 
-        st.subheader("Costos de importaciones por país de origen")
-        imp_resumen = (
-            importaciones
-            .groupby("pais_origen", as_index=False)["costo_mercancia_usd"]
-            .sum()
-        )
-        fig8 = px.pie(
-            imp_resumen,
-            names="pais_origen",
-            values="costo_mercancia_usd",
-            title="Distribución de costo de mercancía por país",
-        )
-        st.plotly_chart(fig8, use_container_width=True)
+    if tab3.open:
+        with tab3:
+            render_tab3(data, firma, fecha_desde, fecha_hasta, region_sel, segmento_sel)
+
+    if tab4.open:
+        with tab4:
+            render_tab4(inventario, importaciones)
 
 
 if __name__ == "__main__":